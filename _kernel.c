@@ -0,0 +1,210 @@
+/*
+ * Compiled version of the recovery kernels of kernel.py
+ * (same functions, same results) :
+ *
+ *     propagate(values, mask) -> number of known bytes (-1 : contradiction)
+ *     expand(subkey, goal) -> 176-byte bytearray
+ *     score_candidates(values, mask, goal, pos) -> list of 256 distances
+ *
+ * Build : python setup_kernel.py build_ext --inplace
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <string.h>
+
+#define KS_LEN 176
+
+static const unsigned char RCON[10] = { 0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1b, 0x36 };
+
+static const unsigned char S[256] = {
+    0x63, 0x7c, 0x77, 0x7b, 0xf2, 0x6b, 0x6f, 0xc5, 0x30, 0x01, 0x67, 0x2b, 0xfe, 0xd7, 0xab, 0x76,
+    0xca, 0x82, 0xc9, 0x7d, 0xfa, 0x59, 0x47, 0xf0, 0xad, 0xd4, 0xa2, 0xaf, 0x9c, 0xa4, 0x72, 0xc0,
+    0xb7, 0xfd, 0x93, 0x26, 0x36, 0x3f, 0xf7, 0xcc, 0x34, 0xa5, 0xe5, 0xf1, 0x71, 0xd8, 0x31, 0x15,
+    0x04, 0xc7, 0x23, 0xc3, 0x18, 0x96, 0x05, 0x9a, 0x07, 0x12, 0x80, 0xe2, 0xeb, 0x27, 0xb2, 0x75,
+    0x09, 0x83, 0x2c, 0x1a, 0x1b, 0x6e, 0x5a, 0xa0, 0x52, 0x3b, 0xd6, 0xb3, 0x29, 0xe3, 0x2f, 0x84,
+    0x53, 0xd1, 0x00, 0xed, 0x20, 0xfc, 0xb1, 0x5b, 0x6a, 0xcb, 0xbe, 0x39, 0x4a, 0x4c, 0x58, 0xcf,
+    0xd0, 0xef, 0xaa, 0xfb, 0x43, 0x4d, 0x33, 0x85, 0x45, 0xf9, 0x02, 0x7f, 0x50, 0x3c, 0x9f, 0xa8,
+    0x51, 0xa3, 0x40, 0x8f, 0x92, 0x9d, 0x38, 0xf5, 0xbc, 0xb6, 0xda, 0x21, 0x10, 0xff, 0xf3, 0xd2,
+    0xcd, 0x0c, 0x13, 0xec, 0x5f, 0x97, 0x44, 0x17, 0xc4, 0xa7, 0x7e, 0x3d, 0x64, 0x5d, 0x19, 0x73,
+    0x60, 0x81, 0x4f, 0xdc, 0x22, 0x2a, 0x90, 0x88, 0x46, 0xee, 0xb8, 0x14, 0xde, 0x5e, 0x0b, 0xdb,
+    0xe0, 0x32, 0x3a, 0x0a, 0x49, 0x06, 0x24, 0x5c, 0xc2, 0xd3, 0xac, 0x62, 0x91, 0x95, 0xe4, 0x79,
+    0xe7, 0xc8, 0x37, 0x6d, 0x8d, 0xd5, 0x4e, 0xa9, 0x6c, 0x56, 0xf4, 0xea, 0x65, 0x7a, 0xae, 0x08,
+    0xba, 0x78, 0x25, 0x2e, 0x1c, 0xa6, 0xb4, 0xc6, 0xe8, 0xdd, 0x74, 0x1f, 0x4b, 0xbd, 0x8b, 0x8a,
+    0x70, 0x3e, 0xb5, 0x66, 0x48, 0x03, 0xf6, 0x0e, 0x61, 0x35, 0x57, 0xb9, 0x86, 0xc1, 0x1d, 0x9e,
+    0xe1, 0xf8, 0x98, 0x11, 0x69, 0xd9, 0x8e, 0x94, 0x9b, 0x1e, 0x87, 0xe9, 0xce, 0x55, 0x28, 0xdf,
+    0x8c, 0xa1, 0x89, 0x0d, 0xbf, 0xe6, 0x42, 0x68, 0x41, 0x99, 0x2d, 0x0f, 0xb0, 0x54, 0xbb, 0x16
+};
+
+static unsigned char INV_S[256];
+
+/* Same relations, in the same order, as kernel.XOR_RELATIONS / SBOX_RELATIONS */
+static int do_propagate(unsigned char *values, unsigned char *mask)
+{
+    int progress = 1;
+    while (progress) {
+        progress = 0;
+        for (int r = 0; r < 10; r++)
+            for (int c = 1; c < 4; c++)
+                for (int j = 0; j < 4; j++) {
+                    int a = 16*(r+1) + 4*c + j, b = 16*r + 4*c + j, d = 16*(r+1) + 4*(c-1) + j;
+                    int n = (mask[a] != 0) + (mask[b] != 0) + (mask[d] != 0);
+                    if (n == 3 && (values[a] ^ values[b] ^ values[d]))
+                        return -1;
+                    if (n != 2)
+                        continue;
+                    if (!mask[a]) { values[a] = values[b] ^ values[d]; mask[a] = 0xff; }
+                    else if (!mask[b]) { values[b] = values[a] ^ values[d]; mask[b] = 0xff; }
+                    else { values[d] = values[a] ^ values[b]; mask[d] = 0xff; }
+                    progress = 1;
+                }
+
+        for (int r = 0; r < 10; r++)
+            for (int j = 0; j < 4; j++) {
+                int o = 16*(r+1) + j, i = 16*r + j, s = 16*r + 12 + (j+1) % 4;
+                unsigned char rcon = j == 0 ? RCON[r] : 0;
+                if (mask[s]) {
+                    if (mask[o] && mask[i]) {
+                        if (values[o] != (values[i] ^ S[values[s]] ^ rcon))
+                            return -1;
+                    }
+                    else if (mask[o]) {
+                        values[i] = values[o] ^ S[values[s]] ^ rcon; mask[i] = 0xff;
+                        progress = 1;
+                    }
+                    else if (mask[i]) {
+                        values[o] = values[i] ^ S[values[s]] ^ rcon; mask[o] = 0xff;
+                        progress = 1;
+                    }
+                }
+                else if (mask[o] && mask[i]) {
+                    values[s] = INV_S[values[o] ^ values[i] ^ rcon]; mask[s] = 0xff;
+                    progress = 1;
+                }
+            }
+    }
+
+    int known = 0;
+    for (int k = 0; k < KS_LEN; k++)
+        known += mask[k] != 0;
+    return known;
+}
+
+static void do_expand(const unsigned char *subkey, int goal, unsigned char *ks)
+{
+    memset(ks, 0, KS_LEN);
+    memcpy(ks + 16*goal, subkey, 16);
+    for (int r = goal - 1; r >= 0; r--) {
+        for (int c = 3; c > 0; c--)
+            for (int j = 0; j < 4; j++)
+                ks[16*r + 4*c + j] = ks[16*(r+1) + 4*c + j] ^ ks[16*(r+1) + 4*(c-1) + j];
+        for (int j = 0; j < 4; j++)
+            ks[16*r + j] = ks[16*(r+1) + j] ^ S[ks[16*r + 12 + (j+1) % 4]] ^ (j == 0 ? RCON[r] : 0);
+    }
+    for (int r = goal; r < 10; r++) {
+        for (int j = 0; j < 4; j++)
+            ks[16*(r+1) + j] = ks[16*r + j] ^ S[ks[16*r + 12 + (j+1) % 4]] ^ (j == 0 ? RCON[r] : 0);
+        for (int c = 1; c < 4; c++)
+            for (int j = 0; j < 4; j++)
+                ks[16*(r+1) + 4*c + j] = ks[16*r + 4*c + j] ^ ks[16*(r+1) + 4*(c-1) + j];
+    }
+}
+
+static int check_len(Py_buffer *buf, Py_ssize_t len, const char *name)
+{
+    if (buf->len != len) {
+        PyErr_Format(PyExc_ValueError, "%s must be %zd bytes", name, len);
+        return 0;
+    }
+    return 1;
+}
+
+static int check_round(int goal, int pos)
+{
+    if (goal < 0 || goal > 10 || pos < 0 || pos > 15) {
+        PyErr_SetString(PyExc_ValueError, "goal must be in [0, 10] and pos in [0, 15]");
+        return 0;
+    }
+    return 1;
+}
+
+static PyObject *propagate(PyObject *self, PyObject *args)
+{
+    Py_buffer values, mask;
+    if (!PyArg_ParseTuple(args, "w*w*", &values, &mask))
+        return NULL;
+
+    PyObject *res = NULL;
+    if (check_len(&values, KS_LEN, "values") && check_len(&mask, KS_LEN, "mask")) {
+        res = PyLong_FromLong(do_propagate(values.buf, mask.buf));
+    }
+    PyBuffer_Release(&values);
+    PyBuffer_Release(&mask);
+    return res;
+}
+
+static PyObject *expand(PyObject *self, PyObject *args)
+{
+    Py_buffer subkey;
+    int goal;
+    if (!PyArg_ParseTuple(args, "y*i", &subkey, &goal))
+        return NULL;
+
+    PyObject *res = NULL;
+    if (check_len(&subkey, 16, "subkey") && check_round(goal, 0)) {
+        unsigned char ks[KS_LEN];
+        do_expand(subkey.buf, goal, ks);
+        res = PyByteArray_FromStringAndSize((const char *) ks, KS_LEN);
+    }
+    PyBuffer_Release(&subkey);
+    return res;
+}
+
+static PyObject *score_candidates(PyObject *self, PyObject *args)
+{
+    Py_buffer values, mask;
+    int goal, pos;
+    if (!PyArg_ParseTuple(args, "y*y*ii", &values, &mask, &goal, &pos))
+        return NULL;
+
+    PyObject *res = NULL;
+    if (check_len(&values, KS_LEN, "values") && check_len(&mask, KS_LEN, "mask") && check_round(goal, pos)) {
+        const unsigned char *v = values.buf, *m = mask.buf;
+        unsigned char subkey[16], ks[KS_LEN];
+        memcpy(subkey, v + 16*goal, 16);
+        res = PyList_New(256);
+        for (int x = 0; res != NULL && x < 256; x++) {
+            subkey[pos] = (unsigned char) x;
+            do_expand(subkey, goal, ks);
+            long d = 0;
+            for (int i = 0; i < KS_LEN; i++)
+                d += m[i] && ks[i] != v[i];
+            PyObject *item = PyLong_FromLong(d);
+            if (item == NULL) {
+                Py_CLEAR(res);
+                break;
+            }
+            PyList_SET_ITEM(res, x, item);
+        }
+    }
+    PyBuffer_Release(&values);
+    PyBuffer_Release(&mask);
+    return res;
+}
+
+static PyMethodDef kernel_methods[] = {
+    {"propagate", propagate, METH_VARARGS, "Propagates the key schedule relations in place, returns the number of known bytes (-1 : contradiction)"},
+    {"expand", expand, METH_VARARGS, "Whole key schedule (176 bytes) from the complete subkey of round goal"},
+    {"score_candidates", score_candidates, METH_VARARGS, "Distances of the 256 candidates of the erased byte pos of the subkey goal"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef kernel_module = {
+    PyModuleDef_HEAD_INIT, "_kernel", "Compiled recovery kernels (see kernel.py)", -1, kernel_methods
+};
+
+PyMODINIT_FUNC PyInit__kernel(void)
+{
+    for (int x = 0; x < 256; x++)
+        INV_S[S[x]] = (unsigned char) x;
+    return PyModule_Create(&kernel_module);
+}
@@ -5,7 +5,6 @@ import aes
 import aeskeyschedule as KS
 from keyDecaying import Binary_erasure_channel, bytes_to_hex
 import math
-import matplotlib.pyplot as plt
 
 
 # Round constant words
@@ -19,7 +18,29 @@ S = [ 0x63, 0x7c, 0x77, 0x7b, 0xf2, 0x6b, 0x6f, 0xc5, 0x30, 0x01, 0x67, 0x2b, 0x
 def hamming_distance(chaine1, chaine2):
     return sum(c1 != c2 for c1, c2 in zip(chaine1, chaine2))
 
-def correcting_errors(hexDecayedKeys):
+'''
+Number of erased bytes ('??') of each subkey
+'''
+def erasure_histogram(hexKeys):
+    return [sum(1 for j in range(0, len(key), 2) if key[j:j+2] == '??') for key in hexKeys]
+
+'''
+Whole key schedule (11 subkeys as bytes) from the complete subkey of round 'goal' (bytes)
+'''
+def expand_from_subkey(base_key, goal):
+    first_key = KS.reverse_key_schedule(bytes(base_key), goal) # We perform the KS from this no error key
+    return KS.key_schedule(first_key)
+
+'''
+Whole key schedule (hex) from the complete subkey of round 'goal' (hex)
+'''
+def rebuild_from_subkey(target_key, goal):
+    tkey = int(target_key, 16)
+
+    base_key = tkey.to_bytes(16, byteorder='big')
+    return bytes_to_hex(expand_from_subkey(base_key, goal))
+
+def correcting_errors(hexDecayedKeys, fallback=None):
     
     # transform keys into 4x4 matrices
     matricesKeys = []
@@ -34,33 +55,19 @@ def correcting_errors(hexDecayedKeys):
         go_on = False
 
         # Check if there is a subkey without any error
-        ctr = []
-        for i in range(len(matricesKeys)):
-            target_key = ''.join(matricesKeys[i])
-            c = 0
-            for j in range(32):
-                if target_key[j:j+2] == '??': 
-                    c+=1
-            
-            ctr.append(c)
+        ctr = erasure_histogram([''.join(matricesKeys[i]) for i in range(len(matricesKeys))])
 
         if 0 in ctr: # If a subkey is without error we stop
             goal = ctr.index(0) # we get the index of the no error key
             target_key = ''.join(matricesKeys[goal]) # we get the no error key
             print('\nfound sub-key without error :', target_key)
-            tkey = int(target_key, 16)
-    
-            base_key = tkey.to_bytes(16, byteorder='big')
-            first_key = KS.reverse_key_schedule(base_key, goal) # We perform the KS from this no error key
-            
-            finalKS = KS.key_schedule(first_key)
-            final_KS = bytes_to_hex(finalKS)
+            final_KS = rebuild_from_subkey(target_key, goal)
 
             print('\ncorrected key schedule :')
             print(final_KS)
             
             print('\nMaster key :', final_KS[0], '\n')
-            return True
+            return final_KS
 
 
         for target in range(len(matricesKeys)):
@@ -75,21 +82,15 @@ def correcting_errors(hexDecayedKeys):
                         b1 = matricesKeys[target+1][0][k:k+2]
                         b2 = matricesKeys[target][3][k+2:k+4]
 
-                        byte1 = hex(S[int(b2, 16)]).lstrip('0x') # Subs operation
-
-                        if len(byte1) != 2:
-                            byte1 = '0'+byte1
+                        byte1 = format(S[int(b2, 16)], '02X') # Subs operation
 
                         byte2 = b1
 
                         if k == 0: # 1st byte depends on the RCON
-                            res = hex( int(byte1,16) ^ RCON[target] ^ int(byte2,16) ).lstrip('0x').upper()
+                            res = format(int(byte1,16) ^ RCON[target] ^ int(byte2,16), '02X')
 
                         else: 
-                            res = hex( int(byte1,16) ^ int(byte2,16) ).lstrip('0x').upper()
-                        
-                        if len(res) != 2:
-                            res = '0'+res
+                            res = format(int(byte1,16) ^ int(byte2,16), '02X')
                         
                         tmp = list(matricesKeys[target][0])
                         
@@ -102,17 +103,11 @@ def correcting_errors(hexDecayedKeys):
 
                         b1 = matricesKeys[target+1][0][6:8]; b2 = matricesKeys[target][3][0:2]
                         
-                        byte1 = hex(S[int(b2, 16)]).lstrip('0x')
-                       
-                        if len(byte1) != 2:
-                            byte1 = '0'+byte1
+                        byte1 = format(S[int(b2, 16)], '02X')
 
                         byte2 = b1
 
-                        res = hex(int(byte1,16) ^ int(byte2,16)).lstrip('0x').upper() # this one doesn't use RCON
-
-                        if len(res) != 2:
-                            res = '0'+res
+                        res = format(int(byte1,16) ^ int(byte2,16), '02X') # this one doesn't use RCON
                         
                         tmp = list(matricesKeys[target][0])
 
@@ -127,21 +122,15 @@ def correcting_errors(hexDecayedKeys):
 
                         b1 = matricesKeys[target][0][k:k+2]; b2 = matricesKeys[target][3][k+2:k+4]
                         
-                        byte1 = hex(S[int(b2, 16)]).lstrip('0x')
-                        
-                        if len(byte1) != 2:
-                            byte1 = '0'+byte1
+                        byte1 = format(S[int(b2, 16)], '02X')
 
                         byte2 = b1
 
                         if k == 0: # 1st byte depends on the RCON
-                            res = hex( int(byte1,16) ^ RCON[target] ^ int(byte2,16) ).lstrip('0x').upper()
+                            res = format(int(byte1,16) ^ RCON[target] ^ int(byte2,16), '02X')
                         
                         else: 
-                            res = hex( int(byte1,16) ^ int(byte2,16) ).lstrip('0x').upper()
-                        
-                        if len(res) != 2:
-                            res = '0'+res
+                            res = format(int(byte1,16) ^ int(byte2,16), '02X')
                         
                         tmp = list(matricesKeys[target+1][0])
                         
@@ -154,16 +143,11 @@ def correcting_errors(hexDecayedKeys):
 
                         b1 = matricesKeys[target][0][6:8]; b2 = matricesKeys[target][3][0:2]
                         
-                        byte1 = hex(S[int(b2, 16)]).lstrip('0x')
-                        if len(byte1) != 2:
-                            byte1 = '0'+byte1
+                        byte1 = format(S[int(b2, 16)], '02X')
                        
                         byte2 = b1
 
-                        res = hex(int(byte1,16) ^ int(byte2,16)).lstrip('0x').upper() # this one doesn't use RCON
-
-                        if len(res) != 2:
-                            res = '0'+res
+                        res = format(int(byte1,16) ^ int(byte2,16), '02X') # this one doesn't use RCON
 
                         tmp = list(matricesKeys[target+1][0])
                         
@@ -200,10 +184,8 @@ def correcting_errors(hexDecayedKeys):
                             if byte1 == '??' or byte2 == '??':
                                 continue
                         
-                        res = hex(int(byte1,16) ^ int(byte2,16)).lstrip('0x')
+                        res = format(int(byte1,16) ^ int(byte2,16), '02X')
                         go_on = True
-                        if len(res) != 2: # == 1
-                            res = '0'+res
 
                         tmp = list(matricesKeys[target][i])
 
@@ -241,10 +223,8 @@ def correcting_errors(hexDecayedKeys):
                             if byte1 == '??' or byte2 == '??':
                                 continue
                         
-                        res = hex(int(byte1,16) ^ int(byte2,16)).lstrip('0x')
+                        res = format(int(byte1,16) ^ int(byte2,16), '02X')
                         go_on = True
-                        if len(res) != 2:
-                            res = '0'+res
                         
                         tmp = list(matricesKeys[target][i])
                         
@@ -278,13 +258,7 @@ def correcting_errors(hexDecayedKeys):
                 print('trying :', target_key)
 
                 #KS then HD between the createed KS and the decayed KS
-                tkey = int(target_key, 16)
-        
-                base_key = tkey.to_bytes(16, byteorder='big')
-                first_key = KS.reverse_key_schedule(base_key, goal) # We perform the KS from this no error key
-                
-                finalKS = KS.key_schedule(first_key)
-                final_KS = bytes_to_hex(finalKS)
+                final_KS = rebuild_from_subkey(target_key, goal)
 
                 hd = 0; temp = 0
                 for i in range(len(matricesKeys)): #we perform the KS
@@ -295,6 +269,8 @@ def correcting_errors(hexDecayedKeys):
 
                 if len(distances) > 1:
                     if abs(distances[-1] - distances[-2]) > 50:
+                        if distances[-2] < distances[-1]: # the right byte was '00' : only the previous KS is needed, not all of them
+                            final_KS = previous_KS
                         #ind_hd = distances.index(min(distances)) #**#
                         print('\ncorrected key schedule :')
                         #print(keySchedules[ind_hd]) #**#
@@ -302,10 +278,15 @@ def correcting_errors(hexDecayedKeys):
 
                         #print('\nMaster key :', keySchedules[ind_hd][0], '\n') #**#
                         print('\nMaster key :', final_KS[0], '\n')
-                        return True
+                        return final_KS
+                previous_KS = final_KS
 
         #if 2 in ctr and not go_on: # ?interesting?
 
+    if fallback is not None: # heavier engine, fed with the bytes found by the sweeps
+        print('\nPropagation blocked, handing over to', fallback.__name__)
+        return fallback([''.join(matricesKeys[i]) for i in range(len(matricesKeys))])
+
     print('\nKS impossible to rebuild')
     return False
 
@@ -313,28 +294,26 @@ def cold_boot(p):
     expanded_decayed_keys = Binary_erasure_channel(p)
     return correcting_errors(expanded_decayed_keys)
 
-def plotResults():
+def plotResults(workers=1, engine='propagation'):
+    import matplotlib.pyplot as plt # only needed for the plots
+    from successStats import sample_curve
+
     maxErasureRate = 30
     liste = [math.ceil(100*(1 - pow(1-(i/100), 8))) for i in range(1, maxErasureRate)] # Erasure rate (on bytes)
-    results = []
-
-    for p in liste:
-        print('p =', p)
-        passed = 0
-        for i in range(10):
-            res = cold_boot(p)
-            print('trial', i+1)
-            if res:
-                passed +=1
-
-        results.append(passed)
-    
-    plt.title('Number of passed reconstructions on 10 trials')
+
+    # each point is sampled until its 95% interval is tight enough
+    stats = sample_curve(liste, workers=workers, engine=engine) # 'propagation' : this corrector, 'auto' : the dispatcher
+    print(stats.summary())
+
+    rates = [stats.points[p].rate() for p in liste]
+    intervals = [stats.points[p].interval() for p in liste]
+    errors = [[r - low for r, (low, high) in zip(rates, intervals)], [high - r for r, (low, high) in zip(rates, intervals)]]
+
+    plt.title('Success rate of the reconstruction (95% Wilson intervals)')
     plt.xlabel('Erasure Percentage')
     plt.ylabel('Passed Reconstruction')
 
-    plt.scatter(liste, results)
-    plt.plot(liste, results)
+    plt.errorbar(liste, rates, yerr=errors, fmt='o-', capsize=3)
     plt.show()
 
 def main(): 
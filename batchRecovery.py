@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import argparse
+import collections
+import contextlib
+import multiprocessing
+import kernel
+import recovery
+import candidateSearch
+from scheduleCache import ScheduleCache, to_schedule
+from keyDecaying import decayed_schedule, bytes_to_hex
+from decayedSchedule import DecayedSchedule, KS_LEN
+
+'''
+Command-line batch front end : reads decayed key schedules from files or
+stdin, recovers them with the chosen engine and streams the results
+as JSON lines on stdout (the engines' traces go to stderr)
+
+    python batchRecovery.py dumps.txt                  # hex, '??' = erased byte
+    python batchRecovery.py dumps.bin --mask dumps.msk # binary + mask
+    cat dumps.txt | python batchRecovery.py - --workers 4
+    python batchRecovery.py --simulate 40 --trials 10  # same as aesCorr.main
+'''
+
+                    ###Input###
+'''
+One schedule per line : 11 subkeys of 32 hex digits, '??' for an erased byte
+(whitespace between the subkeys is ignored)
+'''
+def parse_hex_line(line):
+    digits = ''.join(line.split())
+    if len(digits) != 2 * KS_LEN:
+        raise ValueError('expected %d hex digits, got %d' % (2 * KS_LEN, len(digits)))
+    return DecayedSchedule.from_hex(digits) # raises ValueError on a bad digit
+
+def open_input(name, binary):
+    if name == '-':
+        return sys.stdin.buffer if binary else sys.stdin
+    return open(name, 'rb' if binary else 'r')
+
+def read_hex(names):
+    for name in names:
+        f = open_input(name, False)
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                yield name, index, parse_hex_line(line)
+            except ValueError as e:
+                yield name, index, str(e)
+        if name != '-':
+            f.close()
+
+def read_binary(name, maskName):
+    f = open_input(name, True)
+    with open(maskName, 'rb') as m:
+        index = 0
+        while True:
+            values = f.read(KS_LEN); mask = m.read(KS_LEN)
+            if not values:
+                break
+            if len(values) != KS_LEN or len(mask) != KS_LEN:
+                yield name, index, 'truncated record (or mask)'
+                break
+            yield name, index, DecayedSchedule(values, mask) # 0x00 in the mask = erased
+            index += 1
+    if name != '-':
+        f.close()
+
+def simulate(p, trials):
+    for index in range(trials):
+        yield 'simulate', index, decayed_schedule(p)
+
+
+                    ###Recovery###
+ENGINE = 'auto' # set in every worker by init_worker
+TRACE = sys.stderr
+CACHE = None
+
+def init_worker(engine, quiet, dedup=False, search=None):
+    global ENGINE, TRACE, CACHE
+    ENGINE = engine
+    recovery.set_enumeration_options(**(search or {}))
+    TRACE = open(os.devnull, 'w') if quiet else sys.stderr
+    kernel.TRACE = not quiet
+    CACHE = ScheduleCache(engine) if dedup else None
+
+def make_result(source, index, final_KS, seconds):
+    result = {'source': source, 'index': index, 'seconds': seconds, 'recovered': bool(final_KS)}
+    if final_KS:
+        result['master_key'] = final_KS[0]
+        result['key_schedule'] = final_KS
+    if source == 'simulate':
+        result['correct'] = final_KS == bytes_to_hex()
+    return result
+
+def recover_one(job):
+    source, index, schedule = job
+    if isinstance(schedule, str): # parsing error
+        return {'source': source, 'index': index, 'error': schedule}
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(TRACE):
+            if CACHE is not None:
+                final_KS = CACHE.recover(schedule)
+            else:
+                final_KS = recovery.recover(schedule, ENGINE)
+    except Exception as e: # reported on this record, the stream goes on
+        return {'source': source, 'index': index, 'error': repr(e)}
+    return make_result(source, index, final_KS, time.perf_counter() - start)
+
+'''
+--dedup with several workers : one cache in this process merges the
+copies and answers the solved windows, the pool only runs the engine on
+the merged copies (its results are stored back in the cache). At most
+'window' records are in flight, the results keep the input order
+'''
+def dedup_results(jobs, pool, cache, window):
+    pending = collections.deque() # (schedule, merged, result or AsyncResult)
+
+    def finish():
+        schedule, merged, result = pending.popleft()
+        if merged is None:
+            return result
+        result = result.get()
+        if 'error' in result:
+            final_KS = None
+        else:
+            final_KS = result.get('key_schedule', False)
+        cache.store(schedule, merged, final_KS)
+        return result
+
+    for source, index, schedule in jobs:
+        if isinstance(schedule, str): # parsing error
+            pending.append((None, None, {'source': source, 'index': index, 'error': schedule}))
+        else:
+            start = time.perf_counter()
+            final_KS, merged = cache.prepare(schedule)
+            if merged is None:
+                pending.append((schedule, None, make_result(source, index, final_KS, time.perf_counter() - start)))
+            else:
+                job = (source, index, to_schedule(*merged))
+                pending.append((schedule, merged, pool.apply_async(recover_one, (job,))))
+        while len(pending) > window:
+            yield finish()
+    while pending:
+        yield finish()
+
+'''
+Options of the 'enumeration' engine (also used by recoveryService)
+'''
+def add_search_arguments(parser):
+    parser.add_argument('--max-depth', type=int, help='erased bytes guessed by the enumeration engine (default %d, 256^depth leaves)' % candidateSearch.MAX_DEPTH)
+    parser.add_argument('--memory-cap', type=float, metavar='MIB', help='memory of the enumeration frontier in MiB (default %d), spilled to disk beyond' % (candidateSearch.MEMORY_CAP // 2**20))
+    parser.add_argument('--spill-dir', help='directory of the spilled frontier (default : the temporary directory)')
+
+def search_options(args):
+    return {'maxDepth': args.max_depth,
+            'memoryCap': None if args.memory_cap is None else int(args.memory_cap * 2**20),
+            'spillDir': args.spill_dir}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch recovery of decayed AES-128 key schedules')
+    parser.add_argument('inputs', nargs='*', default=['-'], help="input files ('-' for stdin)")
+    parser.add_argument('--mask', help='mask file : the input is then a binary file of 176-byte key schedules')
+    parser.add_argument('--simulate', type=int, metavar='P', help='decay the reference KS with an erasure percentage P instead of reading inputs')
+    parser.add_argument('--trials', type=int, default=1, help='number of simulated schedules (with --simulate)')
+    parser.add_argument('--engine', default='auto', choices=['auto'] + list(recovery.ENGINES))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--dedup', action='store_true', help='merge the copies of a same schedule and reuse the solved ones')
+    parser.add_argument('--quiet', action='store_true', help="drop the engines' traces instead of writing them to stderr")
+    add_search_arguments(parser)
+    args = parser.parse_args(argv)
+
+    search = search_options(args)
+    init_worker(args.engine, args.quiet, args.dedup, search)
+    if args.simulate is not None:
+        jobs = simulate(args.simulate, args.trials)
+    elif args.mask is not None:
+        if len(args.inputs) != 1:
+            parser.error('--mask takes exactly one binary input')
+        jobs = read_binary(args.inputs[0], args.mask)
+    else:
+        jobs = read_hex(args.inputs)
+
+    if args.workers > 1 and args.dedup:
+        # the cache stays here : the workers only run the engine
+        pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.engine, args.quiet, False, search))
+        results = dedup_results(jobs, pool, CACHE, 4 * args.workers)
+    elif args.workers > 1:
+        pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.engine, args.quiet, False, search))
+        results = pool.imap(recover_one, jobs)
+    else:
+        pool = None
+        results = map(recover_one, jobs)
+
+    for result in results:
+        print(json.dumps(result), flush=True)
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import mmap
+import tempfile
+from keyDecaying import bytes_to_hex
+from decayedSchedule import as_schedule, KS_LEN
+from kernel import propagate
+
+'''
+Multi-byte brute force with a bounded memory : the erased bytes are
+guessed one at a time (256 children per node), each guess is propagated
+with the kernel and the branches which contradict a known byte are cut.
+The nodes of a level (the frontier) are packed records, kept in memory
+up to a cap and spilled to a temporary file beyond it, and the complete
+key schedules are yielded one at a time by a generator : nothing but the
+frontier is ever stored, whatever the depth of the search
+'''
+
+# default search : 2 guessed bytes (65536 leaves), 64 MiB of frontier in memory
+MAX_DEPTH = 2
+MEMORY_CAP = 64 * 2**20
+
+# a node : the 176 values then the mask packed as a bitset (1 bit per byte)
+MASK_LEN = KS_LEN // 8
+RECORD_LEN = KS_LEN + MASK_LEN
+
+TO_BITS = bytes.maketrans(b'\x00\xff', b'01')
+FROM_BITS = bytes.maketrans(b'01', b'\x00\xff')
+
+def pack(values, mask):
+    return bytes(values) + int(bytes(mask).translate(TO_BITS), 2).to_bytes(MASK_LEN, 'big')
+
+def unpack(record):
+    bits = format(int.from_bytes(record[KS_LEN:], 'big'), '0%db' % KS_LEN)
+    return bytearray(record[:KS_LEN]), bytearray(bits.encode().translate(FROM_BITS))
+
+'''
+Nodes of one level of the search : in a preallocated buffer of
+cap // RECORD_LEN records (an anonymous mmap, its pages are only taken
+when written), then in a temporary file (in 'spillDir') for the next ones
+'''
+class Frontier:
+
+    def __init__(self, cap=MEMORY_CAP, spillDir=None):
+        self.slots = cap // RECORD_LEN
+        self.spillDir = spillDir
+        self.buffer = None # allocated by the first append
+        self.count = 0
+        self.spill = None
+        self.spilled = 0
+
+    def __len__(self):
+        return self.count + self.spilled
+
+    def append(self, record):
+        if self.spill is None and self.count < self.slots:
+            if self.buffer is None:
+                self.buffer = mmap.mmap(-1, self.slots * RECORD_LEN)
+            i = self.count * RECORD_LEN
+            self.buffer[i:i + RECORD_LEN] = record
+            self.count += 1
+            return
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile(prefix='frontier-', dir=self.spillDir)
+        self.spill.write(record)
+        self.spilled += 1
+
+    def __iter__(self):
+        for i in range(0, self.count * RECORD_LEN, RECORD_LEN):
+            yield self.buffer[i:i + RECORD_LEN]
+        if self.spill is not None:
+            self.spill.seek(0)
+            for _ in range(self.spilled):
+                yield self.spill.read(RECORD_LEN)
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.count = 0
+        if self.spill is not None:
+            self.spill.close() # the temporary file is deleted
+            self.spill = None
+
+'''
+Next byte to guess : the first erased byte of the subkey which has the
+fewest erased bytes (its completion determines the whole KS)
+'''
+def branch_position(mask):
+    ctr = [mask[16*r:16*r + 16].count(0) for r in range(11)]
+    goal = min((c, r) for r, c in enumerate(ctr) if c)[1]
+    return 16*goal + mask[16*goal:16*goal + 16].index(0)
+
+class CandidateSearch:
+
+    def __init__(self, maxDepth=MAX_DEPTH, memoryCap=MEMORY_CAP, spillDir=None):
+        self.maxDepth = maxDepth
+        self.memoryCap = memoryCap
+        self.spillDir = spillDir
+        # counters of the last search
+        self.nodes = 0     # propagated guesses
+        self.pruned = 0    # guesses contradicting a known byte
+        self.spilled = 0   # records written to disk
+        self.cut = 0       # nodes left incomplete at maxDepth
+
+    '''
+    Generator of the complete key schedules (176 bytes) which agree with
+    every known byte of the dump
+    '''
+    def candidates(self, decayedKeys):
+        schedule = as_schedule(decayedKeys)
+        values = bytearray(schedule); mask = bytearray(schedule.mask)
+        self.nodes = self.pruned = self.spilled = self.cut = 0
+
+        known = propagate(values, mask)
+        if known < 0:
+            return
+        if known == KS_LEN:
+            yield bytes(values)
+            return
+
+        # two levels live at the same time : half of the cap each
+        frontier = Frontier(self.memoryCap // 2, self.spillDir)
+        frontier.append(pack(values, mask))
+        try:
+            for depth in range(self.maxDepth):
+                last = depth == self.maxDepth - 1 # the leaves are only counted
+                nextFrontier = Frontier(self.memoryCap // 2, self.spillDir)
+                for record in frontier:
+                    values, mask = unpack(record)
+                    pos = branch_position(mask)
+                    mask[pos] = 0xff
+                    for x in range(256):
+                        v = bytearray(values); m = bytearray(mask)
+                        v[pos] = x
+                        known = propagate(v, m)
+                        self.nodes += 1
+                        if known < 0:
+                            self.pruned += 1
+                        elif known == KS_LEN:
+                            yield bytes(v)
+                        elif last:
+                            self.cut += 1
+                        else:
+                            nextFrontier.append(pack(v, m))
+                self.spilled += nextFrontier.spilled
+                frontier.close()
+                frontier = nextFrontier
+        finally:
+            frontier.close()
+
+
+                    ###Engine###
+'''
+Propagation then brute force of up to MAX_DEPTH erased bytes.
+The key schedule is returned only if it is the only one found
+(two candidates : the dump is ambiguous, False)
+'''
+def enumeration_recovery(decayedKeys, maxDepth=MAX_DEPTH, memoryCap=MEMORY_CAP, spillDir=None):
+    search = CandidateSearch(maxDepth, memoryCap, spillDir)
+    found = None
+    for ks in search.candidates(decayedKeys):
+        if found is not None:
+            print('\nseveral key schedules agree with the dump')
+            return False
+        found = ks
+
+    print('\n%d guesses, %d pruned, %d spilled, %d cut' % (search.nodes, search.pruned, search.spilled, search.cut))
+    if found is None:
+        print('\nKS impossible to rebuild')
+        return False
+
+    final_KS = bytes_to_hex([found[16*r:16*r + 16] for r in range(11)])
+    print('\ncorrected key schedule :')
+    print(final_KS)
+
+    print('\nMaster key :', final_KS[0], '\n')
+    return final_KS
@@ -0,0 +1,104 @@
+import re
+
+'''
+Decayed key schedule shared by the simulator, the readers and the engines :
+the 176 bytes of the KS (the buffer itself, erased bytes set to 0) plus a
+mask (0xFF = known byte, 0x00 = erased one). Rounds and columns are
+memoryview slices of the buffer, nothing is copied nor converted to hex
+before the output
+'''
+
+ROUNDS = 11
+KS_LEN = ROUNDS * 16
+
+# any non-zero mask byte means 'known'
+MASK_TABLE = bytes([0] + [0xff] * 255)
+
+# hex rendering : every byte is 2 hex digits or '??'
+HEX_BYTES = re.compile(r'(?:[0-9A-Fa-f]{2}|\?\?)*')
+HEX_TO_MASK = str.maketrans('0123456789ABCDEFabcdef?', 'FFFFFFFFFFFFFFFFFFFFFF0')
+
+class DecayedSchedule(bytearray):
+
+    def __init__(self, values, mask):
+        if len(values) != KS_LEN or len(mask) != KS_LEN:
+            raise ValueError('a decayed key schedule is %d bytes (and %d mask bytes)' % (KS_LEN, KS_LEN))
+        self.mask = bytearray(bytes(mask).translate(MASK_TABLE))
+        known = int.from_bytes(values, 'big') & int.from_bytes(self.mask, 'big')
+        super().__init__(known.to_bytes(KS_LEN, 'big'))
+
+    @classmethod
+    def from_hex(cls, hexKeys):
+        hexKey = ''.join(hexKeys)
+        if not HEX_BYTES.fullmatch(hexKey):
+            raise ValueError("a byte is 2 hex digits or '??'")
+        mask = bytes.fromhex(hexKey.translate(HEX_TO_MASK))
+        return cls(bytes.fromhex(hexKey.replace('??', '00')), mask)
+
+    # the mask is part of the value : an erased byte differs from a known 0x00
+    def __eq__(self, other):
+        if isinstance(other, DecayedSchedule):
+            return bytearray.__eq__(self, other) and self.mask == other.mask
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self): # not to be modified while in a set / dict
+        return hash(self.key())
+
+    '''
+    Subkey r (16 bytes) and its mask, as memoryviews on the buffers
+    '''
+    def round(self, r):
+        return memoryview(self)[16*r:16*r + 16], memoryview(self.mask)[16*r:16*r + 16]
+
+    '''
+    Column c (4 bytes) of the subkey r and its mask, as memoryviews
+    '''
+    def column(self, r, c):
+        i = 16*r + 4*c
+        return memoryview(self)[i:i + 4], memoryview(self.mask)[i:i + 4]
+
+    def known(self, i):
+        return self.mask[i] != 0
+
+    '''
+    Number of erased bytes of each subkey (ctr of aesCorr.correcting_errors)
+    '''
+    def erasure_histogram(self):
+        return [self.mask[16*r:16*r + 16].count(0) for r in range(ROUNDS)]
+
+    '''
+    True if the key schedule (11 subkeys as bytes) agrees with every known byte
+    '''
+    def consistent(self, keys):
+        full = int.from_bytes(b''.join(keys), 'big')
+        return (full ^ int.from_bytes(self, 'big')) & int.from_bytes(self.mask, 'big') == 0
+
+    '''
+    Hex rendering ('??' for an erased byte), for the output and the string based code
+    '''
+    def to_hex(self):
+        hexKey = ''.join(format(v, '02X') if m else '??' for v, m in zip(self, self.mask))
+        return [hexKey[i:i + 32] for i in range(0, len(hexKey), 32)]
+
+    def key(self):
+        return bytes(self) + bytes(self.mask)
+
+    def __reduce_ex__(self, protocol): # pickling (worker pools)
+        return DecayedSchedule, (bytes(self), bytes(self.mask))
+
+'''
+The engines accept a DecayedSchedule or the 11 hex subkeys ('??' = erased)
+'''
+def as_schedule(decayedKeys):
+    if isinstance(decayedKeys, DecayedSchedule):
+        return decayedKeys
+    return DecayedSchedule.from_hex(decayedKeys)
+
+def as_hex(decayedKeys):
+    if isinstance(decayedKeys, DecayedSchedule):
+        return decayedKeys.to_hex()
+    return decayedKeys
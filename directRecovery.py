@@ -0,0 +1,125 @@
+import aes
+from aesCorr import expand_from_subkey
+from keyDecaying import bytes_to_hex
+from decayedSchedule import as_schedule
+
+'''
+Direct reconstruction from two adjacent partially known subkeys :
+the 32 bytes of K[r], K[r+1] are linked by 16 relations (12 XOR + 4 S-box),
+so 16 well placed known bytes determine the pair. The relations are solved
+by elimination (no sweep over the whole KS), the subkey found is expanded
+and checked against every known byte of the dump in one pass
+'''
+
+INV_S = [0] * 256
+for x in range(256):
+    INV_S[aes.S[x]] = x
+
+                    ###Elimination###
+# Variables : v = p for K[r][p], v = 16 + p for K[r+1][p]
+# A relation is (mask of the variables, value of their XOR)
+
+def reduce(rows, mask, value):
+    for pivot, (m, v) in rows.items():
+        if mask >> pivot & 1:
+            mask ^= m; value ^= v
+    return mask, value
+
+'''
+Adds the relation to the reduced echelon form 'rows' (pivot -> relation).
+Returns False if it contradicts the previous ones
+'''
+def add_relation(rows, mask, value):
+    mask, value = reduce(rows, mask, value)
+    if mask == 0:
+        return value == 0
+    pivot = mask.bit_length() - 1
+    for p, (m, v) in list(rows.items()):
+        if m >> pivot & 1:
+            rows[p] = (m ^ mask, v ^ value)
+    rows[pivot] = (mask, value)
+    return True
+
+'''
+Value of the variable if the relations determine it, None otherwise
+'''
+def determined(rows, var):
+    if var in rows and rows[var][0] == 1 << var:
+        return rows[var][1]
+    return None
+
+'''
+Solves the pair (K[r], K[r+1]) from its known bytes (memoryviews of the
+values and masks of both subkeys).
+Returns (round, subkey bytes) for a fully determined subkey, or None
+'''
+def solve_pair(r, values, mask, valuesNext, maskNext):
+    rows = {}
+    for p in range(16):
+        if mask[p] and not add_relation(rows, 1 << p, values[p]):
+            return None
+        if maskNext[p] and not add_relation(rows, 1 << (16 + p), valuesNext[p]):
+            return None
+
+    # simple XOR : K[r+1][4c+j] = K[r][4c+j] ^ K[r+1][4(c-1)+j]
+    for c in range(1, 4):
+        for j in range(4):
+            if not add_relation(rows, 1 << (16 + 4*c + j) | 1 << (4*c + j) | 1 << (16 + 4*(c-1) + j), 0):
+                return None
+
+    # 1st column : K[r+1][j] = K[r][j] ^ S[K[r][12 + (j+1)%4]] (^ RCON[r] for j = 0)
+    # becomes linear as soon as one side of the S-box is known
+    linked = [False] * 4
+    progress = True
+    while progress:
+        progress = False
+        for j in range(4):
+            if linked[j]:
+                continue
+            rcon = aes.RCON[r] if j == 0 else 0
+            sIn = 12 + (j+1) % 4
+            x = determined(rows, sIn)
+            if x is not None:
+                ok = add_relation(rows, 1 << (16 + j) | 1 << j, aes.S[x] ^ rcon)
+            else:
+                a, b = determined(rows, 16 + j), determined(rows, j)
+                if a is None or b is None:
+                    continue
+                ok = add_relation(rows, 1 << sIn, INV_S[a ^ b ^ rcon])
+            if not ok:
+                return None
+            linked[j] = progress = True
+
+    for w in range(2):
+        subkey = [determined(rows, 16*w + p) for p in range(16)]
+        if None not in subkey:
+            return r + w, bytes(subkey)
+    return None
+
+'''
+Rebuilds the key schedule from any two adjacent subkeys whose known bytes
+determine one of them (the pairs with the most known bytes first).
+Returns the corrected key schedule (11 hex subkeys) or False
+'''
+def direct_reconstruction(decayedKeys):
+    schedule = as_schedule(decayedKeys)
+    nKnown = [16 - c for c in schedule.erasure_histogram()]
+
+    pairs = [r for r in range(len(nKnown) - 1) if nKnown[r] + nKnown[r+1] >= 16]
+    pairs.sort(key=lambda r: nKnown[r] + nKnown[r+1], reverse=True)
+    for r in pairs:
+        found = solve_pair(r, *schedule.round(r), *schedule.round(r+1))
+        if found is None:
+            continue
+        goal, subkey = found
+        keys = expand_from_subkey(subkey, goal)
+        if schedule.consistent(keys):
+            final_KS = bytes_to_hex(keys)
+            print('\nsub-key', goal, 'solved from rounds', r, 'and', r+1, ':', final_KS[goal])
+            print('\ncorrected key schedule :')
+            print(final_KS)
+
+            print('\nMaster key :', final_KS[0], '\n')
+            return final_KS
+
+    return False
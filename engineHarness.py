@@ -0,0 +1,191 @@
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import multiprocessing
+import aes
+import aeskeyschedule
+import recovery
+from keyDecaying import decayed_schedule, bytes_to_hex
+
+'''
+Differential correctness and throughput harness : every available engine
+is run on the same seeded decayed schedules (random master keys, several
+erasure rates). A recovered schedule must be the one of aes.AES for the
+master key, and the time of each engine is recorded per erasure rate.
+An engine which raises is counted in 'errors' (the other engines go on).
+With --timeout the engines run in a child process, killed (and counted
+in 'timeouts') after that many seconds. The progress goes to stderr.
+The results can be saved and compared with a previous run (--baseline)
+
+    python engineHarness.py --rates 10 30 50 70 --trials 20 --save run.json
+    python engineHarness.py --baseline run.json
+    python engineHarness.py --rates 90 95 --timeout 30
+'''
+
+'''
+Ground truth : key schedule (11 subkeys as bytes) computed by aes.AES
+'''
+def reference_schedule(masterKey):
+    a = aes.AES(masterKey)
+    return [b''.join(a.subkeys[r][i] for i in range(4)) for r in range(11)]
+
+'''
+The ground truth itself is checked against an independent implementation
+(aeskeyschedule) and the fixed vectors of aes.check_ks
+'''
+def check_reference(masterKey, keys):
+    if keys != aeskeyschedule.key_schedule(masterKey):
+        raise AssertionError('aes.AES and aeskeyschedule disagree for ' + masterKey.hex().upper())
+
+'''
+Seeded inputs : (erasure rate, master key, decayed schedule) for each trial
+'''
+def generate_cases(rates, trials, seed=0):
+    cases = []
+    for p in rates:
+        for t in range(trials):
+            rng = random.Random('%d-%d-%d' % (seed, p, t))
+            masterKey = bytes(rng.getrandbits(8) for _ in range(16))
+            keys = reference_schedule(masterKey)
+            check_reference(masterKey, keys)
+            random.seed(rng.random()) # the channel uses the global generator
+            cases.append((p, masterKey, keys, decayed_schedule(p, keys)))
+    return cases
+
+def timed_recover(schedule, engine):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        final_KS = recovery.recover(schedule, engine)
+    return final_KS, time.perf_counter() - start
+
+'''
+Runs an engine in this process, or in a child process killed after
+'timeout' seconds (a new one is started for the next case)
+'''
+class Runner:
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.pool = None
+
+    def __call__(self, schedule, engine):
+        if self.timeout is None:
+            return timed_recover(schedule, engine)
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(1)
+        try:
+            return self.pool.apply_async(timed_recover, (schedule, engine)).get(self.timeout)
+        except multiprocessing.TimeoutError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+def run(engines, cases, timeout=None, progress=sys.stderr):
+    check_reference(aes.check_ks()[0], aes.check_ks()) # fixed vectors
+    results = {engine: {} for engine in engines}
+    mismatches = []; errors = []
+    runner = Runner(timeout)
+    try:
+        for n, (p, masterKey, keys, schedule) in enumerate(cases):
+            expected = bytes_to_hex(keys)
+            case_start = time.perf_counter()
+            for engine in engines:
+                s = results[engine].setdefault(str(p), {'trials': 0, 'recovered': 0, 'wrong': 0, 'errors': 0, 'timeouts': 0, 'seconds': 0.0})
+                s['trials'] += 1
+                try:
+                    final_KS, seconds = runner(schedule, engine)
+                except multiprocessing.TimeoutError:
+                    s['timeouts'] += 1
+                    s['seconds'] += timeout
+                    continue
+                except Exception as e:
+                    s['errors'] += 1
+                    errors.append((engine, p, masterKey.hex().upper(), repr(e)))
+                    continue
+                s['seconds'] += seconds
+
+                if not final_KS:
+                    continue
+                if final_KS == expected:
+                    s['recovered'] += 1
+                else:
+                    s['wrong'] += 1
+                    mismatches.append((engine, p, masterKey.hex().upper(), final_KS[0]))
+            if progress is not None:
+                print('case %d/%d (p=%d) : %.2fs' % (n + 1, len(cases), p, time.perf_counter() - case_start), file=progress, flush=True)
+    finally:
+        runner.close()
+    return results, mismatches, errors
+
+def report(results):
+    lines = ['%-12s %5s %9s %6s %6s %8s %12s' % ('engine', 'p', 'recovered', 'wrong', 'errors', 'timeouts', 'us/schedule')]
+    for engine, rates in results.items():
+        for p, s in rates.items():
+            lines.append('%-12s %5s %5d/%-3d %6d %6d %8d %12.1f' % (engine, p, s['recovered'], s['trials'], s['wrong'], s['errors'], s.get('timeouts', 0), 1e6 * s['seconds'] / s['trials']))
+    return '\n'.join(lines)
+
+'''
+Regressions with respect to a previous run : fewer recovered schedules,
+or an engine slower than 'slowdown' times its previous time
+'''
+def compare(results, baseline, slowdown=1.5):
+    regressions = []
+    for engine, rates in results.items():
+        for p, s in rates.items():
+            old = baseline.get(engine, {}).get(p)
+            if old is None or old['trials'] != s['trials']:
+                continue
+            if s['recovered'] < old['recovered']:
+                regressions.append('%s p=%s : %d recovered instead of %d' % (engine, p, s['recovered'], old['recovered']))
+            if s['seconds'] > slowdown * old['seconds']:
+                regressions.append('%s p=%s : %.3fs instead of %.3fs' % (engine, p, s['seconds'], old['seconds']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Differential correctness and throughput harness for the recovery engines')
+    parser.add_argument('--engines', nargs='*', default=['auto'] + list(recovery.ENGINES))
+    parser.add_argument('--rates', nargs='*', type=int, default=[10, 20, 30, 40, 50, 60, 70, 75])
+    parser.add_argument('--trials', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results (JSON) to this file')
+    parser.add_argument('--baseline', help='previous results (JSON) to compare with')
+    parser.add_argument('--slowdown', type=float, default=1.5, help='tolerated slowdown with respect to the baseline')
+    parser.add_argument('--timeout', type=float, help='time budget (s) of an engine on a case, the engines then run in a child process')
+    parser.add_argument('--no-progress', action='store_true', help='no progress on stderr')
+    args = parser.parse_args(argv)
+
+    cases = generate_cases(args.rates, args.trials, args.seed)
+    results, mismatches, errors = run(args.engines, cases, args.timeout, None if args.no_progress else sys.stderr)
+    print(report(results))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    failed = False
+    for engine, p, masterKey, found in mismatches:
+        print('WRONG KEY : %s p=%d master key %s, recovered %s' % (engine, p, masterKey, found))
+        failed = True
+    for engine, p, masterKey, error in errors:
+        print('ERROR : %s p=%d master key %s : %s' % (engine, p, masterKey, error))
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            for regression in compare(results, json.load(f), args.slowdown):
+                print('REGRESSION :', regression)
+                failed = True
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
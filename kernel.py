@@ -0,0 +1,185 @@
+import random
+import aes
+from decayedSchedule import as_schedule, KS_LEN
+
+'''
+Inner loops of the recovery (propagation of the key schedule relations
+and scoring of the 1-byte brute-force candidates) on the bytes + mask
+buffers of a DecayedSchedule. The compiled version (_kernel.c, built with
+"python setup_kernel.py build_ext --inplace") is used when available,
+otherwise the pure-Python one below, with identical results
+(see differential_check)
+'''
+
+INV_S = [0] * 256
+for x in range(256):
+    INV_S[aes.S[x]] = x
+
+# simple XOR : K[r+1][4c+j] ^ K[r][4c+j] ^ K[r+1][4(c-1)+j] = 0
+XOR_RELATIONS = [(16*(r+1) + 4*c + j, 16*r + 4*c + j, 16*(r+1) + 4*(c-1) + j)
+                 for r in range(10) for c in range(1, 4) for j in range(4)]
+
+# 1st column : K[r+1][j] = K[r][j] ^ S[K[r][12 + (j+1)%4]] ^ rcon
+SBOX_RELATIONS = [(16*(r+1) + j, 16*r + j, 16*r + 12 + (j+1) % 4, aes.RCON[r] if j == 0 else 0)
+                  for r in range(10) for j in range(4)]
+
+                    ###Pure-Python kernels###
+'''
+Propagates the relations until nothing changes (values and mask are
+modified in place). Returns the number of known bytes, or -1 if the
+known bytes contradict a relation
+'''
+def py_propagate(values, mask):
+    S = aes.S
+    progress = True
+    while progress:
+        progress = False
+        for a, b, c in XOR_RELATIONS:
+            n = (mask[a] != 0) + (mask[b] != 0) + (mask[c] != 0)
+            if n == 3 and values[a] ^ values[b] ^ values[c]:
+                return -1
+            if n != 2:
+                continue
+            if not mask[a]:
+                values[a] = values[b] ^ values[c]; mask[a] = 0xff
+            elif not mask[b]:
+                values[b] = values[a] ^ values[c]; mask[b] = 0xff
+            else:
+                values[c] = values[a] ^ values[b]; mask[c] = 0xff
+            progress = True
+
+        for o, i, s, rcon in SBOX_RELATIONS:
+            if mask[s]:
+                if mask[o] and mask[i]:
+                    if values[o] != values[i] ^ S[values[s]] ^ rcon:
+                        return -1
+                elif mask[o]:
+                    values[i] = values[o] ^ S[values[s]] ^ rcon; mask[i] = 0xff
+                    progress = True
+                elif mask[i]:
+                    values[o] = values[i] ^ S[values[s]] ^ rcon; mask[o] = 0xff
+                    progress = True
+            elif mask[o] and mask[i]:
+                values[s] = INV_S[values[o] ^ values[i] ^ rcon]; mask[s] = 0xff
+                progress = True
+
+    return KS_LEN - bytes(mask).count(0)
+
+'''
+Whole key schedule (176 bytes) from the complete subkey of round 'goal'
+'''
+def py_expand(subkey, goal):
+    S = aes.S
+    ks = bytearray(KS_LEN)
+    ks[16*goal:16*goal + 16] = subkey
+    for r in range(goal - 1, -1, -1): # backward
+        for c in range(3, 0, -1):
+            for j in range(4):
+                ks[16*r + 4*c + j] = ks[16*(r+1) + 4*c + j] ^ ks[16*(r+1) + 4*(c-1) + j]
+        for j in range(4):
+            ks[16*r + j] = ks[16*(r+1) + j] ^ S[ks[16*r + 12 + (j+1) % 4]] ^ (aes.RCON[r] if j == 0 else 0)
+    for r in range(goal, 10): # forward
+        for j in range(4):
+            ks[16*(r+1) + j] = ks[16*r + j] ^ S[ks[16*r + 12 + (j+1) % 4]] ^ (aes.RCON[r] if j == 0 else 0)
+        for c in range(1, 4):
+            for j in range(4):
+                ks[16*(r+1) + 4*c + j] = ks[16*r + 4*c + j] ^ ks[16*(r+1) + 4*(c-1) + j]
+    return ks
+
+'''
+For each of the 256 values of the erased byte 'pos' of the subkey 'goal'
+(its 15 other bytes known), number of known bytes of the dump that
+disagree with the expanded key schedule
+'''
+def py_score_candidates(values, mask, goal, pos):
+    subkey = bytearray(values[16*goal:16*goal + 16])
+    known = [i for i in range(KS_LEN) if mask[i]]
+    distances = []
+    for x in range(256):
+        subkey[pos] = x
+        ks = py_expand(subkey, goal)
+        distances.append(sum(1 for i in known if ks[i] != values[i]))
+    return distances
+
+TRACE = True # False : no print of the result (hot path of the batch / service workers)
+
+try:
+    from _kernel import propagate, expand, score_candidates
+    COMPILED = True
+except ImportError: # pure-Python fallback
+    propagate, expand, score_candidates = py_propagate, py_expand, py_score_candidates
+    COMPILED = False
+
+
+                    ###Engine###
+'''
+Propagation then 1-byte brute force, on the kernels.
+Returns the corrected key schedule (11 hex subkeys) or False
+'''
+def kernel_recovery(decayedKeys):
+    schedule = as_schedule(decayedKeys)
+    values = bytearray(schedule); mask = bytearray(schedule.mask)
+
+    known = propagate(values, mask)
+    if known < 0:
+        print('\nthe known bytes contradict the key schedule')
+        return False
+
+    if known < KS_LEN:
+        ctr = [mask[16*r:16*r + 16].count(0) for r in range(11)]
+        if 1 not in ctr:
+            print('\nKS impossible to rebuild')
+            return False
+
+        # brute force of the only erased byte of a subkey : the right value
+        # is the only one which agrees with every known byte
+        goal = ctr.index(1)
+        pos = mask[16*goal:16*goal + 16].index(0)
+        distances = score_candidates(values, mask, goal, pos)
+        if distances.count(0) != 1:
+            print('\nKS impossible to rebuild')
+            return False
+        values[16*goal + pos] = distances.index(0)
+        values = expand(values[16*goal:16*goal + 16], goal)
+
+    hexKey = values.hex().upper()
+    final_KS = [hexKey[i:i + 32] for i in range(0, 2 * KS_LEN, 32)]
+    if TRACE:
+        print('\ncorrected key schedule :')
+        print(final_KS)
+
+        print('\nMaster key :', final_KS[0], '\n')
+    return final_KS
+
+
+                    ###Differential check###
+'''
+Runs the compiled and the pure-Python kernels on the same random decayed
+schedules and asserts that they give the same results
+'''
+def differential_check(trials=200, seed=0):
+    import _kernel # the compiled kernel must be built
+    from keyDecaying import decayed_schedule
+
+    rng = random.Random(seed)
+    keys = aes.check_ks()
+    for t in range(trials):
+        random.seed(rng.random())
+        schedule = decayed_schedule(rng.randint(1, 95), keys)
+
+        v1 = bytearray(schedule); m1 = bytearray(schedule.mask)
+        v2 = bytearray(schedule); m2 = bytearray(schedule.mask)
+        assert _kernel.propagate(v1, m1) == py_propagate(v2, m2)
+        assert v1 == v2 and m1 == m2
+
+        goal = rng.randrange(11); pos = rng.randrange(16)
+        subkey = bytes(keys[goal])
+        assert _kernel.expand(subkey, goal) == py_expand(subkey, goal)
+        m2[16*goal:16*goal + 16] = b'\xff' * 16; m2[16*goal + pos] = 0
+        assert _kernel.score_candidates(v2, m2, goal, pos) == py_score_candidates(v2, m2, goal, pos)
+
+    return True
+
+if __name__ == '__main__':
+    print('compiled kernel :', COMPILED)
+    print('differential check :', differential_check())
@@ -1,7 +1,7 @@
 import time
-import base64
 import random
 import aes
+from decayedSchedule import DecayedSchedule
 
 '''
 Program which creates a hexa decayed KS
@@ -13,13 +13,7 @@ from a 'clean' KS in bytes
 Tranforms the keys from bytes to hex
 '''
 def bytes_to_hex(keys=aes.check_ks()): 
-    hexKeys = []
-    for i in range(0, len(keys)):
-        b = keys[i]
-        h = base64.b16encode(b).decode()
-        hexKeys.append(h)
-
-    return hexKeys
+    return [bytes(b).hex().upper() for b in keys] # same as base64.b16encode(b).decode()
 
                 #       Binary Erasure Channel        #
                         #                    #
@@ -39,24 +33,14 @@ def bytes_to_hex(keys=aes.check_ks()):
 
 def Binary_erasure_channel(p):
     print("\n################################ Binary Erasure Channel ################################\n")
-    HexKeys = bytes_to_hex()
-    
-    keylen = len(HexKeys[0]) # 32
-
-    expanded_decayed_keys_Hex = []
-    for j in range(len(HexKeys)): # 11
-        decayedHex = []
-        for i in range(0, keylen, 2):
-            alea = random.randint(1,100) 
-            if alea < p:
-                decayedHex.append('??') # The whole byte is erased
-
-            else:
-                byte = HexKeys[j][i:i+2]
-                decayedHex.append(byte)
+    return decayed_schedule(p).to_hex()
 
-        decayedRoundHex = ''.join(decayedHex)
+''' Same channel, the decayed KS stays in bytes
+    (DecayedSchedule : values + mask) '''
 
-        expanded_decayed_keys_Hex.append(decayedRoundHex)
+def decayed_schedule(p, keys=aes.check_ks()):
+    values = b''.join(keys)
+    # same draws as Binary_erasure_channel : the whole byte is erased if < p
+    mask = bytes([0xff if random.randint(1,100) >= p else 0 for _ in range(len(values))])
 
-    return expanded_decayed_keys_Hex
\ No newline at end of file
+    return DecayedSchedule(values, mask)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import time
+import aesCorr
+import satRecovery
+import directRecovery
+import kernel
+import candidateSearch
+from keyDecaying import bytes_to_hex
+from decayedSchedule import as_schedule, as_hex
+
+'''
+Common recovery API : every engine takes the decayed key schedule
+(a DecayedSchedule, or 11 hex subkeys with '??' for an erased byte)
+and returns the corrected key schedule (11 hex subkeys, the master
+key first) or False
+'''
+
+ENGINES = {}
+
+def register(name, engine):
+    ENGINES[name] = engine
+
+'''
+Direct rebuild from a subkey without any erased byte (no sweep at all)
+'''
+def rebuild(decayedKeys):
+    schedule = as_schedule(decayedKeys)
+    ctr = schedule.erasure_histogram()
+    if 0 not in ctr:
+        return False
+    goal = ctr.index(0)
+    return bytes_to_hex(aesCorr.expand_from_subkey(schedule.round(goal)[0], goal))
+
+'''
+Direct solve of two adjacent subkeys, see directRecovery
+'''
+def direct(decayedKeys):
+    return directRecovery.direct_reconstruction(decayedKeys)
+
+'''
+Propagation + 1-byte brute force on the (compiled if built) kernels, see kernel
+'''
+def kernel_engine(decayedKeys):
+    return kernel.kernel_recovery(decayedKeys)
+
+'''
+Propagation + brute force of several bytes in bounded memory, see candidateSearch
+(depth of the search, memory cap of the frontier and spill directory
+set by set_enumeration_options)
+'''
+ENUMERATION_OPTIONS = {}
+
+def set_enumeration_options(maxDepth=None, memoryCap=None, spillDir=None):
+    ENUMERATION_OPTIONS.clear()
+    if maxDepth is not None:
+        ENUMERATION_OPTIONS['maxDepth'] = maxDepth
+    if memoryCap is not None:
+        ENUMERATION_OPTIONS['memoryCap'] = memoryCap
+    if spillDir is not None:
+        ENUMERATION_OPTIONS['spillDir'] = spillDir
+
+def enumeration(decayedKeys):
+    return candidateSearch.enumeration_recovery(decayedKeys, **ENUMERATION_OPTIONS)
+
+'''
+Propagation (sweeps + 1-byte brute force), see aesCorr.correcting_errors
+'''
+def propagation(decayedKeys):
+    return aesCorr.correcting_errors(as_hex(decayedKeys))
+
+'''
+Propagation first, then the SAT backend on the bytes it has found
+'''
+def sat(decayedKeys):
+    return aesCorr.correcting_errors(as_hex(decayedKeys), fallback=satRecovery.sat_solve)
+
+register('rebuild', rebuild)
+register('direct', direct)
+register('kernel', kernel_engine)
+register('propagation', propagation)
+register('enumeration', enumeration)
+if satRecovery.pycosat is not None: # optional backend
+    register('sat', sat)
+
+
+                    ###Adaptive engine selection###
+'''
+Picks the engines to run from the erasure histogram of the dump (ctr)
+and the statistics of the previous recoveries : the engines are tried
+from the cheapest expected cost (time / success rate) to the most
+expensive one, until one of them succeeds
+'''
+class Dispatcher:
+
+    # a priori cost (s) of a run, used until statistics are available
+    PRIOR_COST = {'rebuild': 0.001, 'kernel': 0.001, 'direct': 0.002, 'propagation': 0.01, 'enumeration': 0.5, 'sat': 2.0}
+
+    # erasure counts are grouped by buckets of one subkey (16 bytes)
+    BUCKET = 16
+
+    def __init__(self, engines=None):
+        if engines is None:
+            engines = [name for name in ENGINES if name != 'rebuild']
+        self.engines = engines
+        # stats[(engine, bucket)] = [runs, successes, seconds]
+        self.stats = {}
+        self.last_engine = None
+
+    def bucket(self, ctr):
+        return sum(ctr) // self.BUCKET
+
+    def expected_cost(self, engine, bucket):
+        runs, successes, seconds = self.stats.get((engine, bucket), [0, 0, 0.0])
+        mean_time = (seconds + self.PRIOR_COST.get(engine, 1.0)) / (runs + 1)
+        success_rate = (successes + 1) / (runs + 2) # Laplace estimator
+        return mean_time / success_rate
+
+    def choose(self, ctr):
+        if 0 in ctr: # an intact subkey determines the whole KS
+            return ['rebuild']
+        b = self.bucket(ctr)
+        return sorted(self.engines, key=lambda engine: self.expected_cost(engine, b))
+
+    def record(self, engine, bucket, success, seconds):
+        s = self.stats.setdefault((engine, bucket), [0, 0, 0.0])
+        s[0] += 1
+        s[1] += int(bool(success))
+        s[2] += seconds
+
+    def recover(self, decayedKeys):
+        schedule = as_schedule(decayedKeys) # converted once for all the engines
+        ctr = schedule.erasure_histogram()
+        b = self.bucket(ctr)
+        self.last_engine = None # engine which solved the last dump
+        for engine in self.choose(ctr):
+            start = time.perf_counter()
+            try:
+                res = ENGINES[engine](schedule)
+            except Exception as e: # a crashing engine counts as a failure, the next one is tried
+                print('\nengine', engine, 'failed :', repr(e))
+                res = False
+            self.record(engine, b, res, time.perf_counter() - start)
+            if res:
+                self.last_engine = engine
+                return res
+        return False
+
+DISPATCHER = Dispatcher() # statistics shared over a whole campaign
+
+def recover(decayedKeys, engine='auto'):
+    if engine == 'auto':
+        return DISPATCHER.recover(decayedKeys)
+    if engine not in ENGINES:
+        raise ValueError('Unknown or unavailable engine : ' + engine)
+    return ENGINES[engine](decayedKeys)
@@ -0,0 +1,180 @@
+import os
+import stat
+import sys
+import json
+import signal
+import time
+import asyncio
+import argparse
+import contextlib
+import multiprocessing
+import concurrent.futures
+import kernel
+import recovery
+import satRecovery
+from batchRecovery import parse_hex_line, add_search_arguments, search_options
+
+'''
+Long-lived local recovery service : JSON lines on a Unix socket,
+the solving is done by a pool of processes which stay warm between the
+requests (modules, tables and SAT clauses loaded once per worker)
+
+    python recoveryService.py --socket /tmp/coldboot.sock --workers 4
+
+Request (one per line) :
+    {"id": 1, "schedule": "<11 hex subkeys, ?? = erased byte>", "engine": "auto"}
+    (the schedule can also be the list of the 11 hex subkeys)
+Replies (one per line, several per request) :
+    {"id": 1, "status": "queued"}
+    {"id": 1, "status": "running"}
+    {"id": 1, "status": "done", "recovered": true, "master_key": ..., "key_schedule": [...], "seconds": ...}
+    {"id": 1, "status": "error", "error": ...}
+'''
+
+                    ###Workers###
+def init_worker(search=None):
+    sys.stdout = open(os.devnull, 'w') # the engines' traces are not needed here
+    kernel.TRACE = False
+    recovery.set_enumeration_options(**(search or {}))
+    if satRecovery.pycosat is not None:
+        satRecovery.KS_CLAUSES = satRecovery.key_schedule_clauses()
+
+def solve(schedule, engine):
+    start = time.perf_counter()
+    final_KS = recovery.recover(schedule, engine)
+    result = {'recovered': bool(final_KS), 'seconds': time.perf_counter() - start}
+    if final_KS:
+        result['master_key'] = final_KS[0]
+        result['key_schedule'] = final_KS
+    return result
+
+
+                    ###Service###
+class RecoveryService:
+
+    def __init__(self, workers=1, maxJobs=None, search=None):
+        # forkserver : the workers must not inherit the clients' sockets
+        # (a forked worker would keep every connection open at its start)
+        context = multiprocessing.get_context('forkserver')
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker, initargs=(search,))
+        # jobs solved at the same time (the others wait in 'queued')
+        self.slots = asyncio.Semaphore(maxJobs or workers)
+
+    async def job(self, request, send):
+        jobId = request.get('id')
+        try:
+            engine = request.get('engine', 'auto')
+            if engine != 'auto' and engine not in recovery.ENGINES:
+                raise ValueError('Unknown or unavailable engine : ' + str(engine))
+            schedule = request['schedule']
+            if isinstance(schedule, list) and all(isinstance(key, str) for key in schedule):
+                schedule = ''.join(schedule) # the 11 hex subkeys
+            if not isinstance(schedule, str):
+                raise ValueError('schedule : hex string or list of hex subkeys expected')
+            schedule = parse_hex_line(schedule)
+        except (KeyError, TypeError, ValueError) as e:
+            await send({'id': jobId, 'status': 'error', 'error': str(e)})
+            return
+
+        await send({'id': jobId, 'status': 'queued'})
+        async with self.slots:
+            await send({'id': jobId, 'status': 'running'})
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self.pool, solve, schedule, engine)
+            except Exception as e: # a crashed worker must not kill the service
+                await send({'id': jobId, 'status': 'error', 'error': repr(e)})
+                return
+        result.update({'id': jobId, 'status': 'done'})
+        await send(result)
+
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+
+        async def send(message):
+            async with lock:
+                writer.write((json.dumps(message) + '\n').encode())
+                await writer.drain()
+
+        tasks = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('a request is a JSON object')
+            except ValueError as e:
+                await send({'id': None, 'status': 'error', 'error': str(e)})
+                continue
+            tasks.append(asyncio.create_task(self.job(request, send)))
+
+        await asyncio.gather(*tasks, return_exceptions=True) # one bad job must not drop the connection
+        writer.close()
+        await writer.wait_closed()
+
+    async def serve(self, path):
+        if os.path.lexists(path): # left by a previous run : only a socket is removed
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise FileExistsError('%s exists and is not a socket' % path)
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path)
+        print('recovery service listening on', path, file=sys.stderr)
+        # SIGTERM (the usual stop of a service) closes the server : the
+        # pool is then shut down and the socket removed as on Ctrl-C
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, server.close)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            if server.is_serving(): # cancelled from outside, not by SIGTERM
+                raise
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            self.pool.shutdown(cancel_futures=True)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+'''
+Minimal client : sends the schedules (11 hex subkeys each) and returns
+every reply of the service (progress included)
+'''
+async def submit(path, schedules, engine='auto'):
+    reader, writer = await asyncio.open_unix_connection(path)
+    for i, schedule in enumerate(schedules):
+        writer.write((json.dumps({'id': i, 'schedule': ''.join(schedule), 'engine': engine}) + '\n').encode())
+    await writer.drain()
+    writer.write_eof()
+
+    replies = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        replies.append(json.loads(line))
+    writer.close()
+    return replies
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recovery service for decayed AES-128 key schedules')
+    parser.add_argument('--socket', default='/tmp/coldboot.sock', help='path of the Unix socket')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-jobs', type=int, help='jobs solved at the same time (default : --workers)')
+    add_search_arguments(parser)
+    args = parser.parse_args(argv)
+
+    async def run():
+        await RecoveryService(args.workers, args.max_jobs, search_options(args)).serve(args.socket)
+
+    try:
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(run())
+    except FileExistsError as e:
+        sys.exit(str(e))
+
+if __name__ == '__main__':
+    main()
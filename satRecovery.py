@@ -0,0 +1,142 @@
+import aes
+from keyDecaying import bytes_to_hex
+from decayedSchedule import as_schedule
+
+try:
+    import pycosat
+except ImportError: # optional backend
+    pycosat = None
+
+'''
+SAT backend for heavily decayed key schedules :
+the AES-128 key schedule relations (the ones checked in aes.check_ks)
+are encoded as CNF, the known bytes are added as unit clauses
+and the formula is handed to a local solver (pycosat)
+'''
+
+                    ###CNF encoding###
+'''
+DIMACS variable of the bit 'bit' of the byte 'b' of the subkey 'r'
+(bits numbered from the least significant one)
+'''
+def key_var(r, b, bit):
+    return 1 + (r*16 + b)*8 + bit
+
+'''
+DIMACS variable of the bit 'bit' of the j-th S-box output of round r
+(SubWord(RotWord(w3)), 4 bytes per round)
+'''
+def sbox_var(r, j, bit):
+    return 1 + 11*16*8 + (r*4 + j)*8 + bit
+
+def byte_vars(var, *args):
+    return [var(*args, bit) for bit in range(8)]
+
+'''
+Clauses forcing the XOR of the variables 'variables' to be equal to 'parity'
+(every assignment with the wrong parity is forbidden)
+'''
+def xor_clauses(variables, parity):
+    clauses = []
+    n = len(variables)
+    for assignment in range(1 << n):
+        if bin(assignment).count('1') % 2 == parity:
+            continue
+        # the clause is false exactly on this assignment
+        clauses.append([-v if (assignment >> i) & 1 else v for i, v in enumerate(variables)])
+    return clauses
+
+'''
+Clauses forcing out == S[in] (byte-wise), one clause per (input value, output bit)
+'''
+def sbox_clauses(inVars, outVars):
+    clauses = []
+    for v in range(256):
+        notV = [-x if (v >> i) & 1 else x for i, x in enumerate(inVars)] # in != v
+        s = aes.S[v]
+        for j in range(8):
+            clauses.append(notV + [outVars[j] if (s >> j) & 1 else -outVars[j]])
+    return clauses
+
+def key_schedule_clauses():
+    clauses = []
+    for r in range(10):
+        # S-box outputs : S[K[r][13]], S[K[r][14]], S[K[r][15]], S[K[r][12]] (RotWord)
+        for j in range(4):
+            clauses += sbox_clauses(byte_vars(key_var, r, 12 + (j+1) % 4), byte_vars(sbox_var, r, j))
+
+        # 1st column : K[r+1][j] = K[r][j] ^ S[...] (^ RCON[r] for the 1st byte)
+        for j in range(4):
+            rcon = aes.RCON[r] if j == 0 else 0
+            for bit in range(8):
+                clauses += xor_clauses([key_var(r+1, j, bit), key_var(r, j, bit), sbox_var(r, j, bit)], (rcon >> bit) & 1)
+
+        # other columns : K[r+1][4c+j] = K[r][4c+j] ^ K[r+1][4(c-1)+j] (simple XOR)
+        for c in range(1, 4):
+            for j in range(4):
+                for bit in range(8):
+                    clauses += xor_clauses([key_var(r+1, 4*c + j, bit), key_var(r, 4*c + j, bit), key_var(r+1, 4*(c-1) + j, bit)], 0)
+
+    return clauses
+
+KS_CLAUSES = None # built once, the relations do not depend on the dump
+
+'''
+Unit clauses for the known bytes of the decayed key schedule (DecayedSchedule)
+'''
+def known_bytes_clauses(schedule):
+    clauses = []
+    for r in range(11):
+        values, mask = schedule.round(r)
+        for b in range(16):
+            if not mask[b]:
+                continue
+            value = values[b]
+            for bit in range(8):
+                v = key_var(r, b, bit)
+                clauses.append([v if (value >> bit) & 1 else -v])
+    return clauses
+
+def decode(solution):
+    assigned = set(x for x in solution if x > 0)
+    keys = []
+    for r in range(11):
+        keys.append(bytes(sum(1 << bit for bit in range(8) if key_var(r, b, bit) in assigned) for b in range(16)))
+    return keys
+
+
+                    ###Solving###
+'''
+Rebuilds the key schedule from the decayed one (DecayedSchedule or 11 hex subkeys).
+Returns the corrected key schedule (11 hex subkeys) or False if the
+formula is unsatisfiable or has several solutions
+'''
+def sat_solve(decayedKeys):
+    global KS_CLAUSES
+    if pycosat is None:
+        raise ImportError('the SAT backend needs pycosat (pip install pycosat)')
+
+    if KS_CLAUSES is None:
+        KS_CLAUSES = key_schedule_clauses()
+
+    clauses = KS_CLAUSES + known_bytes_clauses(as_schedule(decayedKeys))
+    solution = pycosat.solve(clauses)
+    if solution == 'UNSAT':
+        print('\nSAT : no key schedule matches the known bytes')
+        return False
+
+    # The master key determines the whole KS : we check that no other master key fits
+    masterVars = [key_var(0, b, bit) for b in range(16) for bit in range(8)]
+    assigned = set(solution) # solution is a list of +/- literals
+    blocking = [-v if v in assigned else v for v in masterVars]
+    if pycosat.solve(clauses + [blocking]) != 'UNSAT':
+        print('\nSAT : several key schedules match the known bytes')
+        return False
+
+    final_KS = bytes_to_hex(decode(solution))
+
+    print('\ncorrected key schedule (SAT) :')
+    print(final_KS)
+
+    print('\nMaster key :', final_KS[0], '\n')
+    return final_KS
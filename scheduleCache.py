@@ -0,0 +1,132 @@
+import base64
+import recovery
+from decayedSchedule import DecayedSchedule, as_schedule, KS_LEN
+
+'''
+Cache shared by the recoveries of a whole dump : the same key schedule
+often appears several times (kernel / user-space copies...) with
+different erasures. The partial schedules which agree on every common
+known byte are merged before the engine runs (the pooled known bytes
+often make an unrecoverable copy trivial), and the solved schedules are
+memoized so that identical or subset windows are returned at once
+'''
+
+# A partial schedule is kept as two big ints (values, mask) : agreement
+# and merging of two copies are then a few bitwise operations
+
+def to_ints(schedule):
+    return int.from_bytes(schedule, 'big'), int.from_bytes(schedule.mask, 'big')
+
+def to_schedule(values, mask):
+    return DecayedSchedule(values.to_bytes(KS_LEN, 'big'), mask.to_bytes(KS_LEN, 'big'))
+
+'''
+Number of common known bytes of two partial schedules, None if they disagree on one
+'''
+def overlap(a, b):
+    common = a[1] & b[1]
+    if (a[0] ^ b[0]) & common:
+        return None
+    return bin(common).count('1') // 8
+
+def merge(a, b):
+    return a[0] | (b[0] & ~a[1]), a[1] | b[1]
+
+class ScheduleCache:
+
+    # known bytes needed before trusting a match with a solved KS
+    # (2^-8 chance per byte for another key)
+    MIN_KNOWN = 16
+    # common known bytes needed before merging two partial schedules
+    MIN_OVERLAP = 4
+
+    def __init__(self, engine='auto'):
+        self.engine = engine
+        self.memo = {} # exact window -> solved KS
+        self.solved = [] # solved KS (11 subkeys as bytes)
+        self.index = {} # (position, byte) -> indices in self.solved
+        self.partials = [] # merged partial schedules not solved yet
+        self.failed = set() # merged partial schedules the engine could not solve
+        self.hits = 0; self.merges = 0; self.runs = 0
+
+    def add_solved(self, final_KS):
+        n = len(self.solved)
+        keys = [base64.b16decode(k) for k in final_KS]
+        self.solved.append(keys)
+        for pos, b in enumerate(b''.join(keys)):
+            self.index.setdefault((pos, b), []).append(n)
+
+    '''
+    Solved KS agreeing with every known byte of the window, or None
+    '''
+    def lookup(self, schedule):
+        if KS_LEN - schedule.mask.count(0) < self.MIN_KNOWN:
+            return None
+        pos = schedule.mask.find(0xff)
+        for n in self.index.get((pos, schedule[pos]), []):
+            if schedule.consistent(self.solved[n]):
+                return [base64.b16encode(k).decode() for k in self.solved[n]]
+        return None
+
+    '''
+    First half of a recovery : (final_KS, None) if the window is answered
+    from the cache (final_KS False : nothing new with respect to a failed
+    copy), otherwise (None, merged) where merged is the partial schedule
+    (values, mask) to give to the engine. The merged copy is kept as a
+    partial until store() reports it solved, so that the next copies are
+    merged with it even while it is being solved elsewhere
+    '''
+    def prepare(self, schedule):
+        window = schedule.key()
+        if window in self.memo:
+            self.hits += 1
+            return self.memo[window], None
+
+        final_KS = self.lookup(schedule)
+        if final_KS is not None:
+            self.hits += 1
+            self.memo[window] = final_KS
+            return final_KS, None
+
+        # pools the known bytes of every compatible copy seen so far
+        merged = to_ints(schedule); remaining = []
+        for partial in self.partials:
+            common = overlap(merged, partial)
+            if common is None or common < self.MIN_OVERLAP:
+                remaining.append(partial)
+                continue
+            self.merges += 1
+            merged = merge(merged, partial)
+        self.partials = remaining + [merged]
+
+        if merged in self.failed: # the window adds nothing to an already failed copy
+            return False, None
+
+        self.runs += 1
+        return None, merged
+
+    '''
+    Second half : result of the engine on the merged copy (None : the
+    engine raised, the copy may be tried again)
+    '''
+    def store(self, schedule, merged, final_KS):
+        if final_KS:
+            if merged in self.partials:
+                self.partials.remove(merged)
+            self.add_solved(final_KS)
+            self.memo[schedule.key()] = final_KS
+        elif final_KS is not None:
+            self.failed.add(merged)
+
+    def recover(self, decayedKeys):
+        schedule = as_schedule(decayedKeys)
+        final_KS, merged = self.prepare(schedule)
+        if merged is None:
+            return final_KS
+
+        final_KS = None
+        try:
+            final_KS = recovery.recover(to_schedule(*merged), self.engine)
+        finally:
+            self.store(schedule, merged, final_KS)
+        return final_KS
@@ -0,0 +1,14 @@
+from setuptools import setup, Extension
+
+'''
+Builds the optional compiled kernel next to the sources :
+
+    python setup_kernel.py build_ext --inplace
+
+(kernel.py falls back to its pure-Python version without it)
+'''
+
+setup(
+    name='coldboot-kernel',
+    ext_modules=[Extension('_kernel', sources=['_kernel.c'], extra_compile_args=['-O3'])],
+)
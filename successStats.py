@@ -0,0 +1,147 @@
+import io
+import math
+import time
+import functools
+import contextlib
+import multiprocessing
+import aes
+import recovery
+from keyDecaying import decayed_schedule, bytes_to_hex
+
+'''
+Online statistics of the success-rate curve : the results of the trials
+are pushed one by one, each erasure rate keeps its counts, Wilson
+interval, time histogram and per-engine breakdown in constant memory,
+and stops being sampled as soon as its interval is tight enough
+(the trials end up in the transition region of the curve)
+'''
+
+'''
+Wilson score interval of a binomial proportion (z = 1.96 : 95%)
+'''
+def wilson_interval(successes, n, z=1.96):
+    if n == 0:
+        return 0.0, 1.0
+    phat = successes / n
+    denom = 1 + z*z / n
+    centre = (phat + z*z / (2*n)) / denom
+    half = z * math.sqrt(phat * (1 - phat) / n + z*z / (4*n*n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+class RateStats:
+
+    # time histogram : bin i counts the trials in [T0 * 2^i, T0 * 2^(i+1)[ seconds
+    T0 = 1e-5
+    BINS = 24
+
+    def __init__(self):
+        self.n = 0
+        self.successes = 0
+        self.errors = 0 # trials whose engine raised (counted as failed)
+        self.seconds = 0.0
+        self.histogram = [0] * self.BINS
+        self.stages = {} # engine -> [solved dumps, seconds]
+
+    def push(self, success, seconds, stage=None, error=False):
+        self.n += 1
+        self.successes += int(bool(success))
+        self.errors += int(bool(error))
+        self.seconds += seconds
+        i = int(math.log2(seconds / self.T0)) if seconds > self.T0 else 0
+        self.histogram[min(i, self.BINS - 1)] += 1
+        if stage is not None:
+            s = self.stages.setdefault(stage, [0, 0.0])
+            s[0] += 1
+            s[1] += seconds
+
+    def rate(self):
+        return self.successes / self.n if self.n else 0.0
+
+    def interval(self):
+        return wilson_interval(self.successes, self.n)
+
+class Aggregator:
+
+    def __init__(self, halfWidth=0.05, minTrials=10, maxTrials=1000):
+        self.halfWidth = halfWidth # target half-width of the Wilson interval
+        self.minTrials = minTrials
+        self.maxTrials = maxTrials
+        self.points = {} # erasure percentage -> RateStats
+
+    def push(self, p, success, seconds, stage=None, error=False):
+        self.points.setdefault(p, RateStats()).push(success, seconds, stage, error)
+
+    def settled(self, p):
+        s = self.points.get(p)
+        if s is None or s.n < self.minTrials:
+            return False
+        low, high = s.interval()
+        return (high - low) / 2 <= self.halfWidth or s.n >= self.maxTrials
+
+    def pending(self, points):
+        return [p for p in points if not self.settled(p)]
+
+    def summary(self):
+        lines = []
+        for p in sorted(self.points):
+            s = self.points[p]
+            low, high = s.interval()
+            stages = ', '.join('%s %d' % (e, v[0]) for e, v in sorted(s.stages.items()))
+            lines.append('p = %3d : %4d/%4d passed (%.2f, 95%% CI [%.2f, %.2f]), %d errors, %.4fs mean, %s'
+                         % (p, s.successes, s.n, s.rate(), low, high, s.errors, s.seconds / s.n, stages))
+        return '\n'.join(lines)
+
+
+                    ###Sampling###
+REFERENCE_KS = None
+
+'''
+One synthetic trial : decays the reference KS with the erasure percentage p
+and recovers it with the engine ('auto' : the dispatcher). An engine which
+raises fails the trial. Returns (p, success, seconds, stage, error), stage
+being the engine which solved the dump (None if it was not solved)
+'''
+def trial(p, engine='auto'):
+    global REFERENCE_KS
+    if REFERENCE_KS is None:
+        REFERENCE_KS = bytes_to_hex(aes.check_ks())
+
+    schedule = decayed_schedule(p)
+    error = False
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            final_KS = recovery.recover(schedule, engine)
+    except Exception:
+        final_KS = False; error = True
+    seconds = time.perf_counter() - start
+
+    if engine == 'auto':
+        stage = recovery.DISPATCHER.last_engine
+    else:
+        stage = engine if final_KS else None
+    return p, final_KS == REFERENCE_KS, seconds, stage, error
+
+'''
+Samples every erasure percentage until its interval is settled,
+by rounds of 'batch' trials per pending point
+'''
+def sample_curve(points, aggregator=None, workers=1, batch=10, engine='auto'):
+    if aggregator is None:
+        aggregator = Aggregator()
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    pending = aggregator.pending(points)
+    while pending:
+        jobs = [p for p in pending for _ in range(batch)]
+        run = functools.partial(trial, engine=engine)
+        results = pool.imap_unordered(run, jobs) if pool is not None else map(run, jobs)
+        for p, success, seconds, stage, error in results:
+            aggregator.push(p, success, seconds, stage, error)
+        pending = aggregator.pending(points)
+        print('pending points :', pending)
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return aggregator
@@ -0,0 +1,67 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+import contextlib
+import aes
+import recovery
+import candidateSearch
+from keyDecaying import bytes_to_hex
+from decayedSchedule import DecayedSchedule
+
+'''
+Deep search of candidateSearch with a frontier too small for memory :
+the spilled search must still give the key schedule of aes.AES
+
+    python -m pytest -q test_candidateSearch.py
+'''
+
+'''
+Seeded dump needing 2 guessed bytes : subkey 5 known but 2 bytes,
+12% of the other bytes known (not enough for the propagation)
+'''
+def two_byte_dump(seed=100):
+    rng = random.Random(seed)
+    a = aes.AES(bytes(rng.getrandbits(8) for _ in range(16)))
+    keys = [b''.join(a.subkeys[r][i] for i in range(4)) for r in range(11)]
+    mask = bytearray(0xff if rng.random() < 0.12 else 0 for _ in range(176))
+    mask[80:96] = b'\xff' * 16; mask[85] = 0; mask[90] = 0
+    return keys, DecayedSchedule(b''.join(keys), mask)
+
+class CandidateSearchTest(unittest.TestCase):
+
+    def test_needs_two_bytes(self):
+        keys, schedule = two_byte_dump()
+        self.assertEqual(list(candidateSearch.CandidateSearch(maxDepth=1).candidates(schedule)), [])
+
+    def test_spilled_search(self):
+        keys, schedule = two_byte_dump()
+        with tempfile.TemporaryDirectory() as spillDir:
+            search = candidateSearch.CandidateSearch(maxDepth=2, memoryCap=4000, spillDir=spillDir)
+            self.assertEqual(list(search.candidates(schedule)), [b''.join(keys)])
+            self.assertGreater(search.spilled, 0)
+            self.assertEqual(os.listdir(spillDir), []) # spill files removed
+
+    def test_engine_options(self):
+        keys, schedule = two_byte_dump()
+        recovery.set_enumeration_options(maxDepth=2, memoryCap=4000)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as trace:
+                final_KS = recovery.recover(schedule, 'enumeration')
+        finally:
+            recovery.set_enumeration_options()
+        self.assertEqual(final_KS, bytes_to_hex(keys))
+        self.assertIn('246 spilled', trace.getvalue())
+
+    def test_frontier_order(self):
+        frontier = candidateSearch.Frontier(3 * candidateSearch.RECORD_LEN)
+        records = [bytes([i]) * candidateSearch.RECORD_LEN for i in range(7)]
+        for record in records:
+            frontier.append(record)
+        self.assertEqual((frontier.count, frontier.spilled), (3, 4))
+        self.assertEqual([bytes(r) for r in frontier], records)
+        frontier.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import random
+import unittest
+import contextlib
+from unittest import mock
+import aes
+import kernel
+from keyDecaying import decayed_schedule, bytes_to_hex
+
+'''
+Differential test of the recovery kernels : the compiled and the
+pure-Python kernels must agree, and the kernel engine must give the
+key schedule of aes.AES on seeded decayed schedules
+
+    python -m pytest -q test_kernel.py   (or python -m unittest test_kernel)
+'''
+
+RATES = [10, 30, 50, 60, 70]
+TRIALS = 20
+
+def seeded_dumps():
+    for p in RATES:
+        for t in range(TRIALS):
+            rng = random.Random('%d-%d' % (p, t))
+            a = aes.AES(bytes(rng.getrandbits(8) for _ in range(16)))
+            keys = [b''.join(a.subkeys[r][i] for i in range(4)) for r in range(11)]
+            random.seed(rng.random()) # the channel uses the global generator
+            yield p, keys, decayed_schedule(p, keys)
+
+def recover(schedule):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return kernel.kernel_recovery(schedule)
+
+class PythonKernelTest(unittest.TestCase):
+
+    def test_ground_truth(self):
+        with mock.patch.multiple(kernel, propagate=kernel.py_propagate, expand=kernel.py_expand,
+                                 score_candidates=kernel.py_score_candidates):
+            for p, keys, schedule in seeded_dumps():
+                self.assertEqual(recover(schedule), bytes_to_hex(keys), 'p = %d' % p)
+
+    def test_contradiction(self):
+        schedule = decayed_schedule(0) # every byte known
+        values = bytearray(schedule); mask = bytearray(schedule.mask)
+        values[100] ^= 1
+        self.assertEqual(kernel.py_propagate(values, mask), -1)
+
+@unittest.skipUnless(kernel.COMPILED, 'compiled kernel not built (python setup_kernel.py build_ext --inplace)')
+class CompiledKernelTest(unittest.TestCase):
+
+    def test_differential(self):
+        self.assertTrue(kernel.differential_check())
+
+    def test_ground_truth(self):
+        for p, keys, schedule in seeded_dumps():
+            self.assertEqual(recover(schedule), bytes_to_hex(keys), 'p = %d' % p)
+
+    def test_contradiction(self):
+        import _kernel
+        schedule = decayed_schedule(0)
+        values = bytearray(schedule); mask = bytearray(schedule.mask)
+        values[100] ^= 1
+        self.assertEqual(_kernel.propagate(values, mask), -1)
+
+if __name__ == '__main__':
+    unittest.main()